@@ -1,6 +1,5 @@
 # Import libraries
 import datetime
-import glob
 import json
 import numpy as np
 import os
@@ -11,6 +10,14 @@ from html2email import html2email
 sys.path.insert(0,'kcshan-perf-analysis')
 from email_report import changepoint_test
 
+###################################################################################################
+def load_json(filename):
+    '''
+    Returns parsed ctest json file
+    '''
+    with open(filename) as jf:
+        return json.load(jf)
+
 ###################################################################################################
 def simple_perf_test(wtimes, stdCoeff = 2.0):
     '''
@@ -22,10 +29,11 @@ def simple_perf_test(wtimes, stdCoeff = 2.0):
         'warn' if the above is false but the previous test passes  (This is done to avoid spikes)
         'fail' otherwise
     '''
-    # Compute mean and std
+    # Compute mean and std (reuse the mean rather than letting np.std recompute it)
     wt = np.asarray(wtimes, dtype=np.float64)
-    mu = np.mean(wt)
-    sig = np.std(wt)
+    mu = wt.mean()
+    dev = wt - mu
+    sig = np.sqrt(np.dot(dev, dev)/wt.size)
 
     # Performance test
     if wt[-1] - mu < stdCoeff*sig:
@@ -37,7 +45,7 @@ def simple_perf_test(wtimes, stdCoeff = 2.0):
     return status, wt[-1], mu, sig
 
 ###################################################################################################
-def build_perf_tests(files, cases, nps, timers, metadata):
+def build_perf_tests(files, cases, nps, timers, metadata, today = None):
     '''
     Returns dictionary with performance tests
     '''
@@ -46,9 +54,11 @@ def build_perf_tests(files, cases, nps, timers, metadata):
     #recipients = ['jwatkin@sandia.gov']
 
     # If today's json file doesn't exist, send error message
-    date = datetime.datetime.today().strftime('%Y%m%d')
-    filesWithDate = [filename for filename in files if date in filename]
-    if not filesWithDate:
+    if today is None:
+        today = datetime.date.today()
+    date = today.strftime('%Y%m%d')
+    latestFile = next((filename for filename in files if date in filename), None)
+    if latestFile is None:
         print("Today's json doesn't exist, sending error email...")
         html2email('[ALIPerfTestsFailed] Albany Land Ice Performance Tests - Blake',
                 '''
@@ -61,9 +71,7 @@ def build_perf_tests(files, cases, nps, timers, metadata):
         sys.exit()
 
     # Open today's json file
-    latestFile = filesWithDate[0]
-    with open(latestFile) as jf:
-        ctestData = json.load(jf)
+    ctestData = latestCtestData = load_json(latestFile)
 
     # If today's json file is empty, send error message
     if not ctestData:
@@ -143,9 +151,11 @@ def build_perf_tests(files, cases, nps, timers, metadata):
 
     # Loop over files and construct list of metrics for performance testing
     for filename in files:
-        # Load ctest data
-        with open(filename) as jf:
-            ctestData = json.load(jf)
+        # Load ctest data (today's file has already been loaded)
+        if filename == latestFile:
+            ctestData = latestCtestData
+        else:
+            ctestData = load_json(filename)
 
         # Loop over timers
         for name,metricsCaseDict in metrics.items():
@@ -192,7 +202,7 @@ def build_perf_tests(files, cases, nps, timers, metadata):
     return perfTests
 
 ###################################################################################################
-def build_perf_tests_html(perfTests):
+def build_perf_tests_html(perfTests, today = None):
     '''
     Returns html string with performance status report
     '''
@@ -250,7 +260,14 @@ def build_perf_tests_html(perfTests):
     '''
 
     # Status Table
-    statusTab = '''
+    statusRow = '''
+        <tr>
+            <td>{}</td>
+            <td id="{}">{}</td>
+            <td id="{}">{}</td>
+        </tr>
+        '''
+    statusTab = ['''
     <table>
         <caption><font size="+2"><b>Status</b></font></caption>
         <tr>
@@ -258,33 +275,20 @@ def build_perf_tests_html(perfTests):
             <th>Run Test</th>
             <th>Performance Tests (Passes/Warnings/Fails)</th>
         </tr>
-    '''
-    for name, info in perfTests.items():
-        row = '''
-        <tr>
-            <td>{}</td>
-            <td id="{}">{}</td>
-            <td id="{}">{}</td>
-        </tr>
-        '''.format(name,info['runTestColor'],info['runTest'],info['perfTestsColor'],info['perfTests'])
-        statusTab = statusTab + row
-    statusTab = statusTab + '''
+    ''']
+    statusTab.extend(statusRow.format(name,info['runTestColor'],info['runTest'],info['perfTestsColor'],info['perfTests'])
+                     for name, info in perfTests.items())
+    statusTab.append('''
     </table>
-    '''
+    ''')
+    statusTab = ''.join(statusTab)
 
     # Subject and Metrics Tables
-    subjectTestsFailed = False
-    metricTabs = ''
-    for name, info in perfTests.items():
-        if info['runTest'] == 'Failed':
-            subjectTestsFailed = True
-            metricTabs = metricTabs + '''
+    failedTab = '''
             <br><br>
             <font size="+1">{} test failed...</font>
-            '''.format(name)
-            continue
-        else:
-            metricTab = '''
+            '''
+    metricHeader = '''
             <br><br>
             <table>
                 <caption><font size="+2"><b>{} timers (s) or memory (MiB)</b></font></caption>
@@ -294,24 +298,34 @@ def build_perf_tests_html(perfTests):
                     <th>Mean</th>
                     <th>Std</th>
                 </tr>
-            '''.format(name)
-            for metric, metricInfo in info['metrics'].items():
-                row = '''
+            '''
+    metricRow = '''
                 <tr>
                     <td>{}</td>
                     <td id="{}">{:g}</td>
                     <td>{:g}</td>
                     <td>{:g}</td>
                 </tr>
-                '''.format(metric,metricInfo['perfTestColor'],metricInfo['measured'],metricInfo['mean'],metricInfo['std'])
-                metricTab = metricTab + row
+                '''
+    metricFooter = '''
+            </table>
+            '''
+    subjectTestsFailed = False
+    metricTabs = []
+    for name, info in perfTests.items():
+        if info['runTest'] == 'Failed':
+            subjectTestsFailed = True
+            metricTabs.append(failedTab.format(name))
+            continue
+        else:
+            metricTabs.append(metricHeader.format(name))
+            for metric, metricInfo in info['metrics'].items():
+                metricTabs.append(metricRow.format(metric,metricInfo['perfTestColor'],metricInfo['measured'],metricInfo['mean'],metricInfo['std']))
 
                 if metricInfo['perfTestColor'] == 'red':
                     subjectTestsFailed = True
-            metricTab = metricTab + '''
-            </table>
-            '''
-            metricTabs = metricTabs + metricTab
+            metricTabs.append(metricFooter)
+    metricTabs = ''.join(metricTabs)
     subject = 'Albany Land Ice Performance Tests - Blake'
     if subjectTestsFailed:
         subject = '[ALIPerfTestsFailed] ' + subject
@@ -319,7 +333,9 @@ def build_perf_tests_html(perfTests):
         subject = '[ALIPerfTestsPassed] ' + subject
 
     # Links
-    date = datetime.datetime.today().strftime('%m_%d_%Y')
+    if today is None:
+        today = datetime.date.today()
+    date = today.strftime('%m_%d_%Y')
     testLogsLink = 'https://sems-cdash-son.sandia.gov/sems/index.php?project=Albany&filtercount=1&showfilters=1&field1=buildname&compare1=61&value1=blake-serial-sfad-Albany-PerfTests'
     notebookHtmlLink = 'https://ikalash.github.io/ali/blake_nightly_data/Ali_PerfTestsBlake_' + date + '.html'
     notebookLink = 'https://mybinder.org/v2/gh/ikalash/ikalash.github.io/master?filepath=ali/blake_nightly_data%2FAli_PerfTestsBlake.ipynb'
@@ -346,8 +362,14 @@ if __name__ == "__main__":
     else:
         dir = sys.argv[1]
 
-    # Extract file names
-    files = sorted(glob.glob(os.path.join(dir,'ctest-*')))
+    # Extract file names (a missing directory is reported by build_perf_tests as a missing json)
+    try:
+        files = sorted(entry.path for entry in os.scandir(dir or '.') if entry.name.startswith('ctest-'))
+    except OSError:
+        files = []
+
+    # Use a single date for the whole report
+    today = datetime.date.today()
 
     # Specify case to extract from ctest.json file
     cases = ('ant-2-20km_ml_ls',
@@ -383,12 +405,12 @@ if __name__ == "__main__":
 
     # Run performance tests and build dictionary
     print("Running performance analysis...")
-    perfTests = build_perf_tests(files, cases, nps, timers, metadata)
+    perfTests = build_perf_tests(files, cases, nps, timers, metadata, today)
     #print(perfTests)
 
     # Build html string
     print("Building HTML...")
-    subject, perfTestsHTML = build_perf_tests_html(perfTests)
+    subject, perfTestsHTML = build_perf_tests_html(perfTests, today)
     #print(perfTestsHTML)
 
     # Email status report